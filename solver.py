@@ -6,11 +6,15 @@ BFSアルゴリズムを使用して、発火後に追加投下なしで
 全消しになる最短手順を厳密に探索します。
 """
 
-from dataclasses import dataclass
-from typing import List, Tuple, Set, Optional, Union
-from collections import deque
+from dataclasses import dataclass, field, replace
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple, Set, Optional
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, reduce
+from itertools import repeat
+from operator import or_
 import argparse
 import json
+import random
 import sys
 
 
@@ -21,51 +25,283 @@ class Position:
     col: int  # 0が最左列
 
 
-@dataclass
+@dataclass(frozen=True, eq=False)
+class BitBoard:
+    """
+    ビットボードの形状と事前計算済みマスク
+
+    bit (col * height + row) が (row, col) のマスに対応する。
+    各列は height ビットの連続領域で、下段が下位ビット。
+    get_bitboardでサイズごとに1つだけ作るので、比較・ハッシュは同一性で行う。
+    expand / has_groups / gravity はそのサイズ専用に生成した関数（compile_kernelsを参照）。
+    """
+    height: int  # 1列あたりのビット数（高さの上限）
+    cols: int
+    full: int        # 盤面全体
+    bottom: int      # 各列の最下段
+    top: int         # 各列の最上段
+    col_masks: Tuple[int, ...]  # col_masks[col]: 列colの全ビット
+    # expand(mask): maskの各ビットの上下左右の隣接マス（盤外への回り込みなし）
+    expand: Callable[[int], int] = field(repr=False)
+    # has_groups(masks): 同色の縦か横の隣接ペア（消えるグループ）があるか
+    has_groups: Callable[[Iterable[int]], bool] = field(repr=False)
+    # gravity(masks): 重力を適用したマスク（変化がなければmasksをそのまま返す）
+    gravity: Callable[[Tuple[int, ...]], Tuple[int, ...]] = field(repr=False)
+
+    def bit(self, row: int, col: int) -> int:
+        """(row, col) のビット番号"""
+        return col * self.height + row
+
+    def positions(self, mask: int) -> List[Position]:
+        """maskに含まれるマスの位置の一覧"""
+        positions = []
+        while mask:
+            low = mask & -mask
+            col, row = divmod(low.bit_length() - 1, self.height)
+            positions.append(Position(row, col))
+            mask ^= low
+        return positions
+
+    def mirror_bit(self, index: int) -> int:
+        """ビット番号indexを左右反転した位置のビット番号"""
+        col, row = divmod(index, self.height)
+        return (self.cols - 1 - col) * self.height + row
+
+    def mirror(self, mask: int) -> int:
+        """maskを左右反転したビットマスク"""
+        col_mask = self.col_masks[0]
+        mirrored = 0
+        for col in range(self.cols):
+            column = (mask >> (col * self.height)) & col_mask
+            mirrored |= column << ((self.cols - 1 - col) * self.height)
+        return mirrored
+
+    def __reduce__(self):
+        """pickle時は形状だけを渡し、復元側のget_bitboardで作り直す（生成コードは送れないため）"""
+        return (get_bitboard, (self.height, self.cols))
+
+
+# 色文字 -> 色ID。初めて現れた順に小さな整数を割り当てる
+COLOR_IDS: Dict[str, int] = {}
+
+
+def intern_color(color: str) -> int:
+    """色文字に対応する色IDを返す（未登録なら新しく割り当てる）"""
+    color_id = COLOR_IDS.get(color)
+    if color_id is None:
+        color_id = COLOR_IDS[color] = len(COLOR_IDS)
+    return color_id
+
+
+# Zobristハッシュ用の乱数表: ZOBRIST[color_id][bit]
+# 色やビット数は入力で変わるため必要になった分だけ生成する（シード固定で再現性を保つ）
+_ZOBRIST_RANDOM = random.Random(0x5EED)
+ZOBRIST: List[List[int]] = []
+
+
+def zobrist_key(color_id: int, bit: int) -> int:
+    """色IDcolor_idがビットbitにあるときのZobristキー"""
+    while len(ZOBRIST) <= color_id:
+        ZOBRIST.append([])
+    keys = ZOBRIST[color_id]
+    while len(keys) <= bit:
+        keys.append(_ZOBRIST_RANDOM.getrandbits(64))
+    return keys[bit]
+
+
+def compute_zobrist(colors: Iterable[str], masks: Iterable[int]) -> int:
+    """色ごとのビットマスクからZobristハッシュを計算"""
+    zob = 0
+    for color, mask in zip(colors, masks):
+        color_id = intern_color(color)
+        while mask:
+            low = mask & -mask
+            zob ^= zobrist_key(color_id, low.bit_length() - 1)
+            mask ^= low
+    return zob
+
+
+def compact_column(masks: List[int], column: int, col_mask: int) -> None:
+    """
+    列col_maskの隙間を詰める（masksをその場で書き換える）
+    columnはその列のパネルのあるマス。最下段の空きマスより上を、次のパネルの位置から
+    空きマスまで下げる。列の中の隙間（空きマスの連続）1つにつきシフト1回で済む
+    """
+    while True:
+        gap = ~column & col_mask
+        gap &= -gap
+        above = column & ~(gap - 1)
+        if not above:
+            return
+        landing = above & -above
+        shift = landing.bit_length() - gap.bit_length()
+        region = col_mask & ~(landing - 1)
+        for i, mask in enumerate(masks):
+            if mask & region:
+                masks[i] = (mask & ~region) | ((mask & region) >> shift)
+        column = (column & ~region) | ((column & region) >> shift)
+
+
+# 盤面サイズ専用のビットボード演算のテンプレート
+# 高さ・列数・各種マスクを整数リテラルとして埋め込み、列のループは展開する
+# up: 上へのシフトで隣の列の最下段へ回り込んだ分を除くマスク（downは下へのシフト用）
+# 列の最下位ビットを足しても列内のビットと重ならなければ、その列は下から隙間なく詰まっている
+_KERNEL_TEMPLATE = '''
+def expand(mask):
+    return (((mask << 1) & {up}) | ((mask >> 1) & {down})
+            | ((mask << {height}) & {full}) | (mask >> {height}))
+
+
+def has_groups(masks):
+    for mask in masks:
+        if mask & (((mask << 1) & {up}) | (mask << {height})):
+            return True
+    return False
+
+
+def gravity(masks):
+    occupied = 0
+    for mask in masks:
+        occupied |= mask
+    new_masks = None
+{columns}
+    return masks if new_masks is None else tuple(new_masks)
+'''
+
+_KERNEL_GRAVITY_COLUMN = '''
+    column = occupied & {col_mask}
+    if (column + {col_low}) & column:
+        if new_masks is None:
+            new_masks = list(masks)
+        compact_column(new_masks, column, {col_mask})
+'''
+
+
+def compile_kernels(height: int, cols: int, full: int, bottom: int, top: int,
+                    col_masks: Tuple[int, ...]) -> Dict[str, Callable]:
+    """
+    そのサイズ専用のexpand / has_groups / gravityを生成して返す
+    self.heightなどの属性参照やマスクの計算、列のループがなくなり定数だけの式になる
+    """
+    columns = ''.join(
+        _KERNEL_GRAVITY_COLUMN.format(col_mask=col_mask, col_low=col_mask & -col_mask)
+        for col_mask in col_masks
+    )
+    source = _KERNEL_TEMPLATE.format(
+        height=height,
+        full=full,
+        up=full & ~bottom,
+        down=full & ~top,
+        columns=columns
+    )
+    namespace = {'compact_column': compact_column}
+    exec(compile(source, f'<bitboard {height}x{cols}>', 'exec'), namespace)
+    return {name: namespace[name] for name in ('expand', 'has_groups', 'gravity')}
+
+
+@lru_cache(maxsize=None)
+def get_bitboard(height: int, cols: int) -> BitBoard:
+    """指定サイズのBitBoardを返す（サイズごとにキャッシュし、専用コードを生成する）"""
+    col_mask = (1 << height) - 1
+    col_masks = tuple(col_mask << (col * height) for col in range(cols))
+    bottom = 0
+    top = 0
+    for col in range(cols):
+        bottom |= 1 << (col * height)
+        top |= 1 << (col * height + height - 1)
+    full = (1 << (height * cols)) - 1
+    return BitBoard(
+        height=height,
+        cols=cols,
+        full=full,
+        bottom=bottom,
+        top=top,
+        col_masks=col_masks,
+        **compile_kernels(height, cols, full, bottom, top, col_masks)
+    )
+
+
+@dataclass(frozen=True)
 class Board:
-    """盤面を表すクラス"""
-    grid: List[List[str]]  # grid[row][col], 'x'は空
+    """
+    盤面を表すクラス（色ごとのビットボード）
+    イミュータブルで、盤面を変える操作はすべて新しいBoardを返す
+    """
+    colors: Tuple[str, ...]  # masks[i] が表す色
+    masks: Tuple[int, ...]   # 色ごとのビットマスク（bitの意味はBitBoardを参照）
     rows: int
     cols: int
     max_height: int = 10  # 高さの上限
+    occupied: int = field(init=False, repr=False, compare=False)  # パネルのあるマスのビットマスク
+    zob: int = field(init=False, repr=False, compare=False)  # 盤面のZobristハッシュ
+
+    def __post_init__(self) -> None:
+        """occupiedとzobをmasksから計算（frozenなのでobject.__setattr__で設定）"""
+        occupied = 0
+        for mask in self.masks:
+            occupied |= mask
+        object.__setattr__(self, 'occupied', occupied)
+        object.__setattr__(self, 'zob', compute_zobrist(self.colors, self.masks))
+
+    @property
+    def layout(self) -> BitBoard:
+        """盤面のビット配置。拡張しても変わらないよう高さの上限分を確保する"""
+        return get_bitboard(max(self.rows, self.max_height), self.cols)
+
+    def mask_of(self, color: str) -> int:
+        """指定色のビットマスク（盤面にない色は0）"""
+        if color in self.colors:
+            return self.masks[self.colors.index(color)]
+        return 0
+
+    def with_masks(self, masks: Tuple[int, ...]) -> 'Board':
+        """色ごとのマスクを差し替えた盤面を返す"""
+        return replace(self, masks=masks)
     
-    def copy(self) -> 'Board':
-        """盤面の深いコピーを返す"""
-        return Board(
-            grid=[row[:] for row in self.grid],
-            rows=self.rows,
-            cols=self.cols,
-            max_height=self.max_height
-        )
-    
-    def to_tuple(self) -> Tuple[Tuple[str, ...], ...]:
-        """盤面をイミュータブルなタプル表現に変換（状態管理用）"""
-        return tuple(tuple(row) for row in self.grid)
+    def to_tuple(self) -> Tuple[Tuple[int, int], ...]:
+        """盤面をイミュータブルなタプル表現 ((色ID, マスク), ...) に変換（状態管理用）"""
+        return tuple(sorted(
+            (intern_color(color), mask) for color, mask in zip(self.colors, self.masks) if mask
+        ))
     
     def get(self, row: int, col: int) -> Optional[str]:
         """指定位置のパネルを取得"""
         if 0 <= row < self.rows and 0 <= col < self.cols:
-            return self.grid[row][col]
+            bit = 1 << self.layout.bit(row, col)
+            for color, mask in zip(self.colors, self.masks):
+                if mask & bit:
+                    return color
+            return 'x'
         return None
     
-    def set(self, row: int, col: int, value: str) -> None:
-        """指定位置にパネルを設定"""
-        if 0 <= row < self.rows and 0 <= col < self.cols:
-            self.grid[row][col] = value
+    def replace_cell(self, row: int, col: int, value: str) -> 'Board':
+        """指定位置にパネルを設定した盤面を返す"""
+        if not (0 <= row < self.rows and 0 <= col < self.cols):
+            return self
+        
+        bit = 1 << self.layout.bit(row, col)
+        colors = self.colors
+        if value != 'x' and value not in colors:
+            colors += (value,)
+        
+        masks = []
+        for color, mask in zip(colors, self.masks + (0,) * (len(colors) - len(self.masks))):
+            mask &= ~bit
+            if color == value:
+                mask |= bit
+            masks.append(mask)
+        
+        return replace(self, colors=colors, masks=tuple(masks))
     
     def is_empty(self) -> bool:
         """盤面が空かどうか判定"""
-        for row in self.grid:
-            for cell in row:
-                if cell != 'x':
-                    return False
-        return True
+        return not self.occupied
     
     def __str__(self) -> str:
         """人間可読な形式で盤面を表示"""
         lines = []
         for i in range(self.rows - 1, -1, -1):
-            row_str = ' '.join(self.grid[i])
+            row_str = ' '.join(self.get(i, col) for col in range(self.cols))
             lines.append(f"{i+1} {row_str}")
         return '\n'.join(lines)
 
@@ -130,7 +366,20 @@ def parse_board(text: str) -> Board:
         if len(row) != cols:
             raise ValueError(f"Row {i+1} has {len(row)} columns, expected {cols}")
     
-    return Board(grid=grid_lines, rows=rows, cols=cols, max_height=10)
+    max_height = 10
+    layout = get_bitboard(max(rows, max_height), cols)
+    masks: Dict[str, int] = {}
+    for row in range(rows):
+        for col in range(cols):
+            cell = grid_lines[row][col]
+            if cell != 'x':
+                intern_color(cell)
+                masks[cell] = masks.get(cell, 0) | (1 << layout.bit(row, col))
+    
+    colors = tuple(sorted(masks, key=intern_color))
+    masks = {color: masks[color] for color in colors}
+    return Board(colors=colors, masks=tuple(masks.values()), rows=rows, cols=cols,
+                 max_height=max_height)
 
 
 def parse_next(seq: str) -> List[str]:
@@ -138,79 +387,137 @@ def parse_next(seq: str) -> List[str]:
     return list(seq.strip())
 
 
-def apply_gravity(board: Board) -> Board:
+# ---------------------------------------------------------------------------
+# ビットボード演算
+# 盤面は色IDごとのマスクのタプルで受け渡し、Boardオブジェクトを作らずに整数演算だけで処理する。
+# 探索の内側ループはexpand_masks（drop_column / resolve_masks とBitBoardの専用関数）を使う。
+# ---------------------------------------------------------------------------
+
+def components(mask: int, layout: BitBoard) -> Iterator[int]:
     """
-    重力を適用して落下処理を行う
-    破壊的変更を避けるため新しいBoardを返す
+    ビットマスクの連結成分（上下左右）を1つずつビットマスクとして返す
+    最下位ビットを種にして、広がらなくなるまで隣接マスへ塗り広げる
     """
-    new_board = board.copy()
-    
-    for col in range(new_board.cols):
-        # 各列で下から詰めていく
-        write_pos = 0
-        for row in range(new_board.rows):
-            if new_board.grid[row][col] != 'x':
-                if row != write_pos:
-                    new_board.grid[write_pos][col] = new_board.grid[row][col]
-                    new_board.grid[row][col] = 'x'
-                write_pos += 1
-    
-    return new_board
+    while mask:
+        component = mask & -mask
+        while True:
+            grown = (component | layout.expand(component)) & mask
+            if grown == component:
+                break
+            component = grown
+        yield component
+        mask ^= component
 
 
-def find_groups(board: Board, min_len: int = 2) -> List[Set[Position]]:
-    """
-    同色でmin_len個以上連結しているグループを検出
-    各グループはPositionのセットとして返される
-    """
-    visited = [[False] * board.cols for _ in range(board.rows)]
+def group_masks(masks: Iterable[int], layout: BitBoard, min_len: int = 2) -> List[int]:
+    """同色でmin_len個以上連結しているグループをビットマスクのリストで返す"""
     groups = []
     
-    def dfs(start_row: int, start_col: int, color: str) -> Set[Position]:
-        """深さ優先探索で同色の連結成分を探索"""
-        stack = [(start_row, start_col)]
-        group = set()
-        
-        while stack:
-            row, col = stack.pop()
-            if visited[row][col]:
-                continue
-            
-            if board.grid[row][col] != color:
-                continue
-                
-            visited[row][col] = True
-            group.add(Position(row, col))
-            
-            # 上下左右を探索
-            for dr, dc in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
-                new_row, new_col = row + dr, col + dc
-                if 0 <= new_row < board.rows and 0 <= new_col < board.cols:
-                    if not visited[new_row][new_col]:
-                        stack.append((new_row, new_col))
+    for mask in masks:
+        if min_len >= 2:
+            # 同色の隣接マスを持たないパネルはグループにならないので先に除く
+            mask &= layout.expand(mask)
         
-        return group
-    
-    # 全セルを走査
-    for row in range(board.rows):
-        for col in range(board.cols):
-            if not visited[row][col] and board.grid[row][col] != 'x':
-                group = dfs(row, col, board.grid[row][col])
-                if len(group) >= min_len:
-                    groups.append(group)
+        for component in components(mask, layout):
+            if component.bit_count() >= min_len:
+                groups.append(component)
     
     return groups
 
 
-def remove_groups(board: Board, groups: List[Set[Position]]) -> Board:
-    """指定されたグループを削除した新しい盤面を返す"""
-    new_board = board.copy()
+@lru_cache(maxsize=1 << 18)
+def cleared_mask(masks: Tuple[int, ...], layout: BitBoard) -> int:
+    """
+    消去されるマス（全グループの和）のビットマスクを返す
+    同じ盤面は探索の別の枝や連鎖の途中で何度も現れるので、盤面ごとにキャッシュする
+    """
+    return reduce(or_, group_masks(masks, layout), 0)
+
+
+def resolve_masks(masks: Tuple[int, ...], layout: BitBoard) -> Tuple[int, ...]:
+    """連鎖を最後まで処理した後のマスクを返す"""
+    while layout.has_groups(masks):
+        cleared = cleared_mask(masks, layout)
+        masks = layout.gravity(tuple(mask & ~cleared for mask in masks))
+    return masks
+
+
+# NEXTの'x'（空き）の色ID。パネルは置かれないので色の一覧には含めない
+EMPTY_ID = -1
+
+
+def drop_column(masks: Tuple[int, ...], layout: BitBoard, occupied: int,
+                always_fires: bool, color_id: int, col: int
+                ) -> Tuple[Tuple[int, ...], int, bool]:
+    """
+    列colに色IDcolor_idのパネルを投下し、(新マスク, 置いたビット番号, 発火したか)を返す
+    連鎖はまだ処理しない。列が満杯の場合はビット番号-1を返し、マスクは変化しない
+    occupiedはmasksのパネルのあるマス、always_firesはmasksにもともと消えるグループがあるか
+    （複数の列に投下するときに1回だけ計算すればよいよう引数で受け取る）
+    color_idがEMPTY_IDのときはパネルを置かず、ビット番号-1を返す
+    """
+    # 投下位置を探す（列内の空きマスのうち最下位ビット）
+    empty = ~occupied & layout.col_masks[col]
+    if not empty:
+        return masks, -1, False
+    if color_id == EMPTY_ID:
+        # 'x'は何も置かないが、盤面にもともと消えるグループがあれば発火する
+        return masks, -1, always_fires
+    bit = empty & -empty
+    same_color = masks[color_id]
+    new_masks = masks[:color_id] + (same_color | bit,) + masks[color_id + 1:]
     
-    for group in groups:
-        for pos in group:
-            new_board.set(pos.row, pos.col, 'x')
+    # 盤面にもともと消えるグループがあれば、どこに置いても発火する
+    # なければ、発火するのは置いたパネルが同色のパネルと隣接したときだけ
+    fired = always_fires or bool(layout.expand(bit) & same_color)
+    return new_masks, bit.bit_length() - 1, fired
+
+
+def drop_masks(masks: Tuple[int, ...], layout: BitBoard, color_id: int,
+               col: int) -> Tuple[Tuple[int, ...], int, bool]:
+    """
+    列colに色IDcolor_idのパネルを投下し、(新マスク, 置いたビット番号, 発火したか)を返す
+    発火した場合は連鎖を最後まで処理したマスクを返す
+    列が満杯の場合はビット番号-1を返し、マスクは変化しない
+    """
+    occupied = 0
+    for mask in masks:
+        occupied |= mask
     
-    return new_board
+    new_masks, index, fired = drop_column(
+        masks, layout, occupied, layout.has_groups(masks), color_id, col
+    )
+    if fired:
+        new_masks = resolve_masks(new_masks, layout)
+    return new_masks, index, fired
+
+
+# ---------------------------------------------------------------------------
+# Board単位の操作
+# ---------------------------------------------------------------------------
+
+def apply_gravity(board: Board) -> Board:
+    """重力を適用して落下処理を行った盤面を返す"""
+    new_masks = board.layout.gravity(board.masks)
+    if new_masks == board.masks:
+        return board
+    return board.with_masks(new_masks)
+
+
+def find_groups(board: Board, min_len: int = 2) -> List[int]:
+    """
+    同色でmin_len個以上連結しているグループを検出
+    各グループはビットマスクとして返される（位置はBitBoard.positionsで取り出せる）
+    """
+    return group_masks(board.masks, board.layout, min_len)
+
+
+def remove_groups(board: Board, groups: List[int]) -> Board:
+    """指定されたグループを削除した新しい盤面を返す"""
+    cleared = reduce(or_, groups, 0)
+    if not board.occupied & cleared:
+        return board
+    return board.with_masks(tuple(mask & ~cleared for mask in board.masks))
 
 
 def extend_board_if_needed(board: Board) -> Board:
@@ -218,28 +525,15 @@ def extend_board_if_needed(board: Board) -> Board:
     盤面の高さが足りない場合、上限まで拡張する
     """
     if board.rows >= board.max_height:
-        return board.copy()
+        return board
     
     # 最上段に非空のセルがあるかチェック
-    needs_extension = False
-    for col in range(board.cols):
-        if board.grid[board.rows - 1][col] != 'x':
-            needs_extension = True
-            break
-    
-    if not needs_extension:
-        return board.copy()
+    top_row = board.layout.bottom << (board.rows - 1)
+    if not board.occupied & top_row:
+        return board
     
-    # 拡張が必要な場合
-    new_rows = min(board.rows + 1, board.max_height)
-    new_grid = [['x'] * board.cols for _ in range(new_rows)]
-    
-    # 既存のデータをコピー
-    for row in range(board.rows):
-        for col in range(board.cols):
-            new_grid[row][col] = board.grid[row][col]
-    
-    return Board(grid=new_grid, rows=new_rows, cols=board.cols, max_height=board.max_height)
+    # 拡張が必要な場合（ビット配置は上限分確保済みなので行数を増やすだけ）
+    return replace(board, rows=min(board.rows + 1, board.max_height))
 
 
 def resolve_chain(board: Board) -> Board:
@@ -247,21 +541,10 @@ def resolve_chain(board: Board) -> Board:
     連鎖を最後まで処理して最終盤面を返す
     消去→落下→消去→...を繰り返す
     """
-    current_board = board.copy()
-    
-    while True:
-        # 消去可能なグループを探す
-        groups = find_groups(current_board)
-        if not groups:
-            break
-        
-        # グループを消去
-        current_board = remove_groups(current_board, groups)
-        
-        # 重力を適用
-        current_board = apply_gravity(current_board)
-    
-    return current_board
+    new_masks = resolve_masks(board.masks, board.layout)
+    if new_masks == board.masks:
+        return board
+    return board.with_masks(new_masks)
 
 
 def drop_piece(board: Board, color: str, col: int) -> Tuple[Board, bool]:
@@ -273,105 +556,339 @@ def drop_piece(board: Board, color: str, col: int) -> Tuple[Board, bool]:
     # まず盤面を必要に応じて拡張
     extended_board = extend_board_if_needed(board)
     
-    # 投下位置を探す（一番下の空きマス）
-    drop_row = -1
-    for row in range(extended_board.rows):
-        if extended_board.grid[row][col] == 'x':
-            drop_row = row
-            break
+    colors = extended_board.colors
+    masks = extended_board.masks
+    if color == 'x':
+        color_id = EMPTY_ID
+    else:
+        if color not in colors:
+            colors += (color,)
+            masks += (0,)
+        color_id = colors.index(color)
     
-    if drop_row == -1:
-        # 列が満杯（高さ上限に達している）
+    new_masks, index, fired = drop_masks(
+        masks, extended_board.layout, color_id, col
+    )
+    
+    if index < 0:
+        # 列が満杯（高さ上限に達している）か、'x'を投下した
+        if fired:
+            return extended_board.with_masks(new_masks), True
         return extended_board, False
     
-    # ピースを配置
-    extended_board.set(drop_row, col, color)
+    return replace(extended_board, colors=colors, masks=new_masks), fired
+
+
+def reconstruct_steps(parents: List[int], step_of: List[Tuple[str, int]],
+                      node: int) -> List[Step]:
+    """親ポインタをたどって根からnodeまでの手順（発火前の手のみ）を復元"""
+    steps = []
+    while parents[node] >= 0:
+        piece, column = step_of[node]
+        steps.append(Step(piece=piece, column=column, fired=False))
+        node = parents[node]
+    steps.reverse()
+    return steps
+
+
+# この数未満のフロンティアはプロセス間の受け渡しの方が高くつくので並列化しない
+PARALLEL_MIN_FRONTIER = 512
+
+
+def expand_masks(masks: Tuple[int, ...], layout: BitBoard, color_id: int
+                 ) -> Tuple[int, List[Tuple[int, Tuple[int, ...], int]]]:
+    """
+    1つの盤面の各列に色IDcolor_idを投下し、(全消しになった列, 子のリスト)を返す
+    全消しになる列がなければ-1。子は発火しなかった手のみで (列, マスク, 置いたビット番号)
     
-    # 消去判定
-    groups = find_groups(extended_board)
-    fired = len(groups) > 0
+    全列で共通のoccupiedと発火判定の前提は1回だけ計算し、
+    連鎖と全消し判定は発火した列だけで行う
+    """
+    occupied = 0
+    for mask in masks:
+        occupied |= mask
+    always_fires = layout.has_groups(masks)
+    children = []
     
-    if fired:
-        # 発火したら連鎖を最後まで処理
-        extended_board = resolve_chain(extended_board)
+    for col in range(layout.cols):
+        new_masks, index, fired = drop_column(
+            masks, layout, occupied, always_fires, color_id, col
+        )
+        
+        if not fired:
+            # まだ発火していない場合は探索を継続
+            children.append((col, new_masks, index))
+        elif not any(resolve_masks(new_masks, layout)):
+            # 発火して全消し成功！
+            return col, children
+        # 全消しできなかった場合はこの枝は終了
+        # 注: 現在の実装では発火後は投下終了
     
-    return extended_board, fired
+    return -1, children
 
 
-@dataclass(frozen=True)
-class State:
-    """探索の状態を表すクラス"""
-    board_tuple: Tuple[Tuple[str, ...], ...]  # イミュータブルな盤面表現
-    next_index: int  # 次に使うNEXTのインデックス
-    unfired: bool    # まだ発火していないか
+def expand_chunk(chunk: List[Tuple[int, ...]], layout: BitBoard, color_id: int
+                 ) -> List[Tuple[int, List[Tuple[int, Tuple[int, ...], int]]]]:
+    """フロンティアの一部をまとめて展開する（ワーカープロセス用）"""
+    return [expand_masks(masks, layout, color_id) for masks in chunk]
+
+
+def encode_colors(board: Board, next_seq: List[str]
+                  ) -> Tuple[List[str], Tuple[int, ...], List[int]]:
+    """
+    探索用に色を盤面ごとの小さな整数 (0, 1, ...) に置き換える
+    (色の一覧, 色ごとの初期マスク, NEXTの色番号の列) を返す
+    NEXTの'x'は色の一覧に含めず、EMPTY_IDに置き換える
+    """
+    palette = sorted((set(board.colors) | set(next_seq)) - {'x'},
+                     key=intern_color)
+    local_ids = {color: i for i, color in enumerate(palette)}
+    local_ids['x'] = EMPTY_ID
+    initial_masks = tuple(board.mask_of(color) for color in palette)
+    return palette, initial_masks, [local_ids[color] for color in next_seq]
 
 
-def solve(board: Board, next_seq: List[str]) -> Optional[Solution]:
+def zobrist_tables(palette: List[str], layout: BitBoard
+                   ) -> Tuple[List[List[int]], List[List[int]]]:
+    """
+    paletteの色番号ごとのZobristキーの表と、左右反転した位置のキーの表を返す
+    探索中は表を引くだけで済み、色文字から色IDへの変換も起きない
+    """
+    size = layout.height * layout.cols
+    keys = []
+    mirror_keys = []
+    for color in palette:
+        color_id = intern_color(color)
+        row = [zobrist_key(color_id, bit) for bit in range(size)]
+        keys.append(row)
+        mirror_keys.append([row[layout.mirror_bit(bit)] for bit in range(size)])
+    return keys, mirror_keys
+
+
+def child_zobrist(zob: int, mirror_zob: int, zob_keys: List[List[int]],
+                  mirror_keys: List[List[int]], color_id: int, index: int
+                  ) -> Tuple[int, int]:
+    """
+    親の (Zobristハッシュ, 左右反転盤面のZobristハッシュ) から、ビットindexに
+    色番号color_idのパネルを置いた子のハッシュを差分で求める
+    列が満杯のとき（index < 0）は盤面が変わらずNEXTだけ進むので親と同じ
+    """
+    if index < 0:
+        return zob, mirror_zob
+    return zob ^ zob_keys[color_id][index], mirror_zob ^ mirror_keys[color_id][index]
+
+
+def solve(board: Board, next_seq: List[str], workers: int = 1) -> Optional[Solution]:
     """
     BFSで最短手順を探索
+    深さごとにフロンティアをまとめて展開する（レベル同期BFS）
+    workers > 1 のときは各深さの展開をプロセスに分割し、重複判定は本体でまとめて行う
     """
-    initial_state = State(
-        board_tuple=board.to_tuple(),
-        next_index=0,
-        unfired=True
+    # 色を小さな整数に置き換え、盤面は色ごとのマスクのタプルで扱う
+    palette, initial_masks, next_ids = encode_colors(board, next_seq)
+    layout = board.layout
+    zob_keys, mirror_keys = zobrist_tables(palette, layout)
+    
+    initial_mirror_zob = compute_zobrist(
+        board.colors, [layout.mirror(mask) for mask in board.masks]
     )
     
-    queue = deque([(initial_state, [])])  # (状態, 手順)
-    visited = {initial_state}
+    # 色数による枝刈り: パネルは同色2個以上でしか消えないので、
+    # 盤面に1個しかなく残りのNEXTにも含まれない色があれば全消しは不可能
+    # remaining[i][c]: NEXTのi番目以降に含まれる色IDcの個数
+    remaining = [[0] * len(palette) for _ in range(len(next_ids) + 1)]
+    for i in range(len(next_ids) - 1, -1, -1):
+        remaining[i][:] = remaining[i + 1]
+        if next_ids[i] != EMPTY_ID:
+            remaining[i][next_ids[i]] += 1
+    if any(mask.bit_count() == 1 and supply == 0
+           for mask, supply in zip(initial_masks, remaining[0])):
+        return None
+    
+    # 手順は親ポインタで持ち、解が見つかったときだけ復元する
+    # parents[node]: 親ノードのID（根は-1）
+    # step_of[node]: 親からの1手 (色, 列(1-indexed))
+    parents: List[int] = [-1]
+    step_of: List[Tuple[str, int]] = [('', 0)]
+    
+    # フロンティアの要素は (ノードID, マスク, Zobristハッシュ, 左右反転盤面のZobristハッシュ)
+    # next_indexは深さそのもの、発火した盤面はフロンティアに入らないので状態には持たない
+    frontier = [(0, initial_masks, board.zob, initial_mirror_zob)]
     explored_nodes = 0
     
-    while queue:
-        state, steps = queue.popleft()
-        explored_nodes += 1
-        
-        # NEXTを使い切った
-        if state.next_index >= len(next_seq):
-            continue
-        
-        # 現在の盤面を復元
-        current_board = Board(
-            grid=[list(row) for row in state.board_tuple],
-            rows=len(state.board_tuple),
-            cols=len(state.board_tuple[0]) if state.board_tuple else 0
-        )
-        
-        # 各列に投下を試す
-        for col in range(current_board.cols):
-            new_board, fired = drop_piece(
-                current_board,
-                next_seq[state.next_index],
-                col
-            )
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for next_index, color in enumerate(next_seq):
+            if not frontier:
+                break
+            color_id = next_ids[next_index]
             
-            new_step = Step(
-                piece=next_seq[state.next_index],
-                column=col + 1,  # 1-indexed
-                fired=fired
-            )
-            new_steps = steps + [new_step]
+            # フロンティア全体を展開（結果はフロンティアと同じ順序）
+            all_masks = [masks for _, masks, _, _ in frontier]
+            if executor is not None and len(frontier) >= PARALLEL_MIN_FRONTIER:
+                size = -(-len(all_masks) // (workers * 4))
+                chunks = [all_masks[i:i + size] for i in range(0, len(all_masks), size)]
+                results = []
+                for chunk_result in executor.map(
+                    expand_chunk, chunks, repeat(layout), repeat(color_id)
+                ):
+                    results.extend(chunk_result)
+            else:
+                results = expand_chunk(all_masks, layout, color_id)
+            
+            # 深さdの状態は必ずnext_index=dなので、異なる深さの状態が一致することはない
+            # 重複判定は次の深さの状態どうしだけで足り、訪問済み集合は深さごとに作り直す
+            # 左右反転した盤面は解も左右反転するだけなので同一視し、
+            # min(board_zob, mirror_zob) をキーにする。保持するのは実際の盤面なので
+            # 手順の復元で列を反転する必要はない
+            next_frontier = []
+            seen: Set[int] = set()
             
-            if fired:
-                # 発火した場合
-                if new_board.is_empty():
-                    # 全消し成功！
+            # 子の枝刈り判定が変わりうるのは投下した色だけ（他の色は盤面もNEXTも親と同じ）
+            # 投下した色が盤面にdead_count個で、以降のNEXTにない子は捨てる
+            # 'x'の子はマスクが親と同じなので枝刈りしない
+            dead_count = -1
+            if color_id != EMPTY_ID and remaining[next_index + 1][color_id] == 0:
+                dead_count = 1
+            
+            for (node, _, zob, mirror_zob), (solved_col, children) in zip(frontier, results):
+                explored_nodes += 1
+                
+                if solved_col >= 0:
+                    steps = reconstruct_steps(parents, step_of, node)
+                    steps.append(Step(
+                        piece=color,
+                        column=solved_col + 1,  # 1-indexed
+                        fired=True
+                    ))
                     return Solution(
-                        steps=new_steps,
-                        fired_step=len(new_steps),
+                        steps=steps,
+                        fired_step=len(steps),
                         explored_nodes=explored_nodes
                     )
-                # 全消しできなかった（この枝は終了）
-                # 注: 現在の実装では発火後は投下終了
-            else:
-                # まだ発火していない場合は探索を継続
-                new_state = State(
-                    board_tuple=new_board.to_tuple(),
-                    next_index=state.next_index + 1,
-                    unfired=True
-                )
                 
-                if new_state not in visited:
-                    visited.add(new_state)
-                    queue.append((new_state, new_steps))
+                if next_index + 1 == len(next_seq):
+                    # NEXTを使い切るので、この先発火することはない
+                    continue
+                
+                for col, new_masks, index in children:
+                    if dead_count > 0 and new_masks[color_id].bit_count() == dead_count:
+                        continue
+                    
+                    new_zob, new_mirror_zob = child_zobrist(
+                        zob, mirror_zob, zob_keys, mirror_keys, color_id, index
+                    )
+                    key = min(new_zob, new_mirror_zob)
+                    if key not in seen:
+                        seen.add(key)
+                        parents.append(node)
+                        step_of.append((color, col + 1))
+                        next_frontier.append(
+                            (len(parents) - 1, new_masks, new_zob, new_mirror_zob)
+                        )
+            
+            frontier = next_frontier
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    
+    return None
+
+
+def solve_ida(board: Board, next_seq: List[str]) -> Optional[Solution]:
+    """
+    IDA*（反復深化A*）で最短手順を探索
+    メモリは探索の深さとその反復の置換表の分だけで済む
+    
+    下界h: 発火する1手は必ず必要。さらに盤面に1個しかない色は、NEXTでその色が
+    次に来る位置まで投下しないと消せないので、その位置までの手数も下界になる
+    """
+    palette, initial_masks, next_ids = encode_colors(board, next_seq)
+    layout = board.layout
+    zob_keys, mirror_keys = zobrist_tables(palette, layout)
+    n = len(next_seq)
+    infinity = n + 1  # どの手数でも届かないことを表す下界
+    
+    # first_at[i][c]: NEXTのi番目以降で色IDcが最初に出る位置（なければn）
+    first_at = [[n] * len(palette) for _ in range(n + 1)]
+    for i in range(n - 1, -1, -1):
+        first_at[i][:] = first_at[i + 1]
+        if next_ids[i] != EMPTY_ID:
+            first_at[i][next_ids[i]] = i
+    
+    def heuristic(masks: Tuple[int, ...], next_index: int) -> int:
+        """next_indexから全消しまでに必要な手数の下界"""
+        h = 1
+        for color_id, mask in enumerate(masks):
+            if mask and not mask & (mask - 1):
+                position = first_at[next_index][color_id]
+                if position >= n:
+                    return infinity
+                h = max(h, position - next_index + 1)
+        return h
+    
+    initial_mirror_zob = compute_zobrist(
+        board.colors, [layout.mirror(mask) for mask in board.masks]
+    )
+    
+    path: List[Tuple[str, int]] = []  # 根からの手順 (色, 列(1-indexed))
+    explored_nodes = 0
+    
+    def search(masks: Tuple[int, ...], zob: int, mirror_zob: int,
+               next_index: int, bound: int, table: Set[Tuple[int, int]]) -> int:
+        """
+        f = g + h がbound以下の範囲で深さ優先探索する
+        解が見つかれば-1、なければboundを超えたfの最小値を返す
+        """
+        nonlocal explored_nodes
+        explored_nodes += 1
+        
+        color = next_seq[next_index]
+        color_id = next_ids[next_index]
+        solved_col, children = expand_masks(masks, layout, color_id)
+        if solved_col >= 0:
+            path.append((color, solved_col + 1))
+            return -1
+        
+        next_bound = infinity
+        for col, new_masks, index in children:
+            new_zob, new_mirror_zob = child_zobrist(
+                zob, mirror_zob, zob_keys, mirror_keys, color_id, index
+            )
+            
+            # 同じ反復で同じ深さに現れた盤面（左右反転を含む）は結果も同じ
+            key = (next_index + 1, min(new_zob, new_mirror_zob))
+            if key in table:
+                continue
+            table.add(key)
+            
+            f = next_index + 1 + heuristic(new_masks, next_index + 1)
+            if f > bound:
+                next_bound = min(next_bound, f)
+                continue
+            
+            path.append((color, col + 1))
+            result = search(new_masks, new_zob, new_mirror_zob, next_index + 1,
+                            bound, table)
+            if result < 0:
+                return -1
+            path.pop()
+            next_bound = min(next_bound, result)
+        
+        return next_bound
+    
+    bound = heuristic(initial_masks, 0)
+    while bound <= n:
+        bound = search(initial_masks, board.zob, initial_mirror_zob, 0, bound, set())
+        if bound < 0:
+            steps = [Step(piece=piece, column=column, fired=False)
+                     for piece, column in path]
+            steps[-1].fired = True
+            return Solution(
+                steps=steps,
+                fired_step=len(steps),
+                explored_nodes=explored_nodes
+            )
     
     return None
 
@@ -439,6 +956,10 @@ def main():
     parser.add_argument('--next', type=str, help='NEXT文字列')
     parser.add_argument('--format', choices=['human', 'json'], default='human',
                        help='出力形式 (default: human)')
+    parser.add_argument('--workers', type=int, default=1,
+                       help='探索に使うプロセス数 (default: 1)')
+    parser.add_argument('--algorithm', choices=['bfs', 'ida'], default='bfs',
+                       help='探索アルゴリズム (default: bfs)')
     
     args = parser.parse_args()
     
@@ -483,7 +1004,10 @@ def main():
     # パースと探索
     try:
         board = parse_board(board_text)
-        solution = solve(board, next_seq)
+        if args.algorithm == 'ida':
+            solution = solve_ida(board, next_seq)
+        else:
+            solution = solve(board, next_seq, workers=args.workers)
         
         if args.format == 'json':
             print(format_solution_json(solution, board, next_seq))
@@ -0,0 +1,29 @@
+"""solver.py のテスト"""
+
+from solver import drop_piece, parse_board, parse_next, solve, solve_ida
+
+
+def test_drop_empty_piece_keeps_board():
+    """NEXTの'x'は何も置かず、発火もしない"""
+    board = parse_board('xx')
+    board, fired = drop_piece(board, 'x', 0)
+    assert not fired
+    board, fired = drop_piece(board, 'x', 0)
+    assert not fired
+    assert board.is_empty()
+    assert 'x' not in board.colors
+
+
+def test_empty_piece_consumes_next():
+    """'x'はNEXTを1つ消費するだけで、次の色で全消しできる"""
+    for search in (solve, solve_ida):
+        solution = search(parse_board('r'), parse_next('xr'))
+        assert solution is not None
+        assert [(step.piece, step.column, step.fired)
+                for step in solution.steps] == [('x', 1, False), ('r', 1, True)]
+
+
+def test_empty_pieces_never_clear():
+    """'x'だけでは発火しない"""
+    for search in (solve, solve_ida):
+        assert search(parse_board('xx'), parse_next('xx')) is None